@@ -0,0 +1,163 @@
+import math
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict, Optional, Tuple
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.security import OAuth2PasswordRequestForm
+from .auth import oauth2_scheme, decode_access_token, verify_user
+
+# Token bucket limits per route class: (tokens per second, burst capacity)
+ROUTE_LIMITS: Dict[str, Tuple[float, float]] = {
+    "auth": (1.0, 10.0),
+    # Secondary per-address limit for auth. Behind a proxy every client can
+    # share one address, so this only stops floods, not individual users
+    "auth_client": (20.0, 100.0),
+    "csv_write": (2.0, 10.0),
+    "csv_read": (10.0, 40.0),
+}
+
+# Global cap on expensive operations (bcrypt, CSV rewrite + backup, restore)
+MAX_EXPENSIVE_CONCURRENCY = 4
+
+# Buckets untouched for this long are full again and can be dropped
+BUCKET_IDLE_SECONDS = 300
+# Beyond this, the least recently used bucket is evicted
+MAX_BUCKETS = 10000
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def take(self, now: float, cost: float = 1.0) -> float:
+        """Consume tokens; return 0 if allowed, else seconds until allowed."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+class AdmissionController:
+    """Per-key rate limiting plus a global concurrency cap on expensive work."""
+
+    def __init__(self, limits: Dict[str, Tuple[float, float]] = ROUTE_LIMITS,
+                 max_expensive: int = MAX_EXPENSIVE_CONCURRENCY):
+        self.limits = limits
+        self.max_expensive = max_expensive
+        # Kept in least-recently-used order, which is also ``updated`` order
+        self._buckets: "OrderedDict[Tuple[str, str], TokenBucket]" = OrderedDict()
+        self._evictions = 0
+        self._in_flight = 0
+        self._peak_in_flight = 0
+        self._counters: Dict[str, Dict[str, int]] = {
+            route_class: {"admitted": 0, "rate_limited": 0, "shed": 0}
+            for route_class in limits
+        }
+
+    def check_rate(self, route_class: str, key: str) -> float:
+        now = time.monotonic()
+        bucket = self._buckets.get((route_class, key))
+        if bucket is None:
+            if len(self._buckets) >= MAX_BUCKETS:
+                self._buckets.popitem(last=False)
+                self._evictions += 1
+            rate, capacity = self.limits[route_class]
+            bucket = self._buckets[(route_class, key)] = TokenBucket(rate, capacity, now)
+        else:
+            self._buckets.move_to_end((route_class, key))
+        return bucket.take(now)
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """Drop idle buckets; they would have refilled to capacity anyway."""
+        now = time.monotonic() if now is None else now
+        dropped = 0
+        while self._buckets:
+            key, bucket = next(iter(self._buckets.items()))
+            if now - bucket.updated <= BUCKET_IDLE_SECONDS:
+                break
+            del self._buckets[key]
+            dropped += 1
+        return dropped
+
+    @asynccontextmanager
+    async def admit(self, route_class: str, key: str, expensive: bool = False,
+                    client: Optional[str] = None):
+        counters = self._counters[route_class]
+
+        # Optional secondary limit on the caller's address, checked first.
+        # Route classes without a ``<route_class>_client`` limit skip it
+        checks = [(route_class, key)]
+        client_class = f"{route_class}_client"
+        if client is not None and client_class in self.limits:
+            checks.insert(0, (client_class, client))
+        for check_class, check_key in checks:
+            retry_after = self.check_rate(check_class, check_key)
+            if retry_after > 0:
+                self._counters[check_class]["rate_limited"] += 1
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Too many requests",
+                    headers={"Retry-After": str(math.ceil(retry_after))},
+                )
+
+        if not expensive:
+            counters["admitted"] += 1
+            yield
+            return
+
+        # Shed immediately rather than queueing behind a saturated worker
+        if self._in_flight >= self.max_expensive:
+            counters["shed"] += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server busy, try again shortly",
+                headers={"Retry-After": "1"},
+            )
+
+        counters["admitted"] += 1
+        self._in_flight += 1
+        self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+        try:
+            yield
+        finally:
+            self._in_flight -= 1
+
+    def stats(self) -> Dict:
+        return {
+            "in_flight": self._in_flight,
+            "peak_in_flight": self._peak_in_flight,
+            "max_expensive": self.max_expensive,
+            "buckets": len(self._buckets),
+            "bucket_evictions": self._evictions,
+            "routes": {name: dict(counters) for name, counters in self._counters.items()},
+        }
+
+admission_controller = AdmissionController()
+
+def user_admission(route_class: str, expensive: bool = False):
+    """Dependency that authenticates the user and admits them per route class."""
+    async def dependency(token: str = Depends(oauth2_scheme)):
+        # The token signature is enough to key the limit, so rejected
+        # callers never reach the database
+        current_user = decode_access_token(token)
+        async with admission_controller.admit(route_class, current_user, expensive):
+            await verify_user(current_user)
+            yield current_user
+    return dependency
+
+def client_address(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+def login_admission(route_class: str = "auth", expensive: bool = True):
+    """Dependency that admits a login per submitted username and client address."""
+    async def dependency(request: Request, form_data: OAuth2PasswordRequestForm = Depends()):
+        async with admission_controller.admit(route_class, form_data.username, expensive,
+                                              client=client_address(request)):
+            yield form_data.username
+    return dependency
@@ -4,9 +4,10 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from .database import get_db
+from .database import session_scope
 from .models import User
 
 # Constants
@@ -48,14 +49,25 @@ async def get_user(db: AsyncSession, username: str) -> Optional[User]:
     result = await db.execute(query)
     return result.scalar_one_or_none()
 
-async def authenticate_user(db: AsyncSession, username: str, password: str) -> Optional[User]:
-    """Authenticate user with username and password."""
-    user = await get_user(db, username)
-    
+async def authenticate_user(username: str, password: str) -> Optional[User]:
+    """Authenticate user with username and password.
+
+    bcrypt runs between two short sessions, so no connection is held while
+    hashing.
+    """
+    async with session_scope("http", wait=False) as db:
+        user = await get_user(db, username)
+
+    # bcrypt is CPU-bound, so keep it off the event loop
+    if user:
+        if not await run_in_threadpool(verify_password, password, user.hashed_password):
+            return None
+        return user
+
     # For demo purposes, create user if not exists
-    if not user:
-        hashed_password = get_password_hash(password)
-        user = User(username=username, hashed_password=hashed_password)
+    hashed_password = await run_in_threadpool(get_password_hash, password)
+    user = User(username=username, hashed_password=hashed_password)
+    async with session_scope("http", wait=False) as db:
         db.add(user)
         try:
             await db.commit()
@@ -63,33 +75,35 @@ async def authenticate_user(db: AsyncSession, username: str, password: str) -> O
         except Exception:
             await db.rollback()
             return None
-        return user
-
-    if not verify_password(password, user.hashed_password):
-        return None
     return user
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: AsyncSession = Depends(get_db)
-) -> str:
-    """Get current user from JWT token."""
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    
+
+def decode_access_token(token: str) -> str:
+    """Return the username from a JWT access token without touching the database."""
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         if username is None:
-            raise credentials_exception
+            raise _credentials_exception()
     except JWTError:
-        raise credentials_exception
-    
-    user = await get_user(db, username)
+        raise _credentials_exception()
+    return username
+
+async def verify_user(username: str) -> None:
+    """Check that the user still exists, holding a session only for the lookup."""
+    async with session_scope("http", wait=False) as db:
+        user = await get_user(db, username)
     if user is None:
-        raise credentials_exception
-    
+        raise _credentials_exception()
+
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> str:
+    """Get current user from JWT token."""
+    username = decode_access_token(token)
+    await verify_user(username)
     return username
@@ -1,27 +1,24 @@
-import asyncio
 import random
 from datetime import datetime
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import delete
 from . import models
+from .database import session_scope
 
-async def generate_random_numbers(db: AsyncSession):
-    """Generate and store random numbers every second."""
-    while True:
-        try:
-            # Generate random number
-            number = random.uniform(-100, 100)
-            
-            # Store in database
-            random_number = models.RandomNumber(
-                timestamp=datetime.utcnow(),
-                value=number
-            )
-            db.add(random_number)
-            await db.commit()
-            
-            # Wait for 1 second
-            await asyncio.sleep(1)
-            
-        except Exception as e:
-            print(f"Error in random number generation: {e}")
-            await asyncio.sleep(1)  # Wait before retrying
+async def sample_random_number():
+    """Generate and store one random number; scheduled every second."""
+    number = random.uniform(-100, 100)
+
+    # Store in database, holding a connection only for this write
+    async with session_scope("background") as db:
+        random_number = models.RandomNumber(
+            timestamp=datetime.utcnow(),
+            value=number
+        )
+        db.add(random_number)
+        await db.commit()
+
+async def sweep_expired_sessions():
+    """Delete login sessions whose tokens have expired."""
+    async with session_scope("background") as db:
+        await db.execute(delete(models.Session).where(models.Session.expires_at < datetime.utcnow()))
+        await db.commit()
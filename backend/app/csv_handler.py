@@ -1,10 +1,19 @@
 import csv
+import os
 import shutil
 import asyncio
 from datetime import datetime
 from pathlib import Path
 from typing import List, Dict, Optional
 from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+from .csv_index import load_index, write_index, index_path
+
+FIELDNAMES = ['user', 'broker', 'API key', 'API secret', 'pnl', 'margin', 'max_risk']
+KEY_FIELD = 'API key'
+
+# Keep a memory-mapped key index next to the CSV and its backups
+INDEX_ENABLED = True
 
 class CSVLock:
     def __init__(self):
@@ -16,6 +25,11 @@ class CSVLock:
         self._version += 1
         return self._version
 
+    @property
+    def version(self) -> int:
+        """Current store version, bumped on every acquire."""
+        return self._version
+
     def release(self):
         self._lock.release()
 
@@ -36,12 +50,55 @@ def backup_csv(csv_path: Path) -> Path:
     # Create an empty file if source doesn't exist
     if not csv_path.exists():
         with open(csv_path, 'w', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=['user', 'broker', 'API key', 'API secret', 'pnl', 'margin', 'max_risk'])
+            writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
             writer.writeheader()
     
     shutil.copy2(csv_path, backup_path)
+
+    # copy2 keeps the mtime, so the copied index stays valid for the backup
+    if INDEX_ENABLED and load_index(csv_path) is not None:
+        shutil.copy2(index_path(csv_path), index_path(backup_path))
     return backup_path
 
+def restore_csv(backup_path: Path, csv_path: Path) -> None:
+    """Copy a backup over the CSV file, bringing its index along if it has one."""
+    shutil.copy2(backup_path, csv_path)
+    backup_index = index_path(backup_path)
+    if INDEX_ENABLED and backup_index.exists():
+        # The live index may be mapped; swap in a new inode instead of
+        # rewriting it in place
+        live_index = index_path(csv_path)
+        tmp_index = live_index.with_suffix(".idx.tmp")
+        shutil.copy2(backup_index, tmp_index)
+        os.replace(tmp_index, live_index)
+    # Without one, the old index no longer matches and is rebuilt on the next lookup
+
+def _key_column(rows: List[Dict]) -> List[str]:
+    keys = [row.get(KEY_FIELD) for row in rows]
+    if all(type(key) is str for key in keys):
+        return keys
+    # Mirror what csv.DictWriter writes for non-string cells
+    return ["" if key is None else str(key) for key in keys]
+
+def _refresh_index(csv_path: Path, keys: List[str]) -> None:
+    """Rewrite the key index. It is derived data: a failure is logged, and
+    lookups fall back to scanning the CSV until the next successful write."""
+    try:
+        write_index(csv_path, {KEY_FIELD: keys})
+    except Exception as e:
+        print(f"Error writing CSV index: {e}")
+
+def _scan_for_key(csv_path: Path, api_key: str) -> Optional[int]:
+    """Scan the CSV for ``api_key``, rebuilding the stale index on the way."""
+    with open(csv_path, 'r', newline='') as f:
+        keys = [row[KEY_FIELD] for row in csv.DictReader(f)]
+    if INDEX_ENABLED:
+        _refresh_index(csv_path, keys)
+    try:
+        return keys.index(api_key)
+    except ValueError:
+        return None
+
 async def read_csv(csv_path: Path) -> List[Dict]:
     """Read CSV file and return list of dictionaries."""
     ensure_data_dir()
@@ -50,7 +107,7 @@ async def read_csv(csv_path: Path) -> List[Dict]:
             if not csv_path.exists():
                 # Create empty file with headers if it doesn't exist
                 with open(csv_path, 'w', newline='') as f:
-                    writer = csv.DictWriter(f, fieldnames=['user', 'broker', 'API key', 'API secret', 'pnl', 'margin', 'max_risk'])
+                    writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
                     writer.writeheader()
                 return []
             
@@ -70,11 +127,13 @@ async def write_csv(csv_path: Path, data: List[Dict]) -> None:
             backup_csv(csv_path)
             
             # Write new data
-            fieldnames = ['user', 'broker', 'API key', 'API secret', 'pnl', 'margin', 'max_risk']
             with open(csv_path, 'w', newline='') as f:
-                writer = csv.DictWriter(f, fieldnames=fieldnames)
+                writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
                 writer.writeheader()
                 writer.writerows(data)
+
+            if INDEX_ENABLED:
+                await run_in_threadpool(lambda: _refresh_index(csv_path, _key_column(data)))
             
             return version
         finally:
@@ -82,9 +141,65 @@ async def write_csv(csv_path: Path, data: List[Dict]) -> None:
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error writing to CSV: {str(e)}")
 
+async def append_csv_row(csv_path: Path, row: Dict) -> int:
+    """Append a single row to the CSV file with locking and backup."""
+    ensure_data_dir()
+    try:
+        version = await csv_lock.acquire()
+        try:
+            # Read the keys before the CSV changes and the index goes stale
+            index = load_index(csv_path) if INDEX_ENABLED else None
+            keys = index.column(KEY_FIELD) if index is not None else None
+
+            # Create backup (also creates the file with a header if missing)
+            backup_csv(csv_path)
+
+            # Appending skips parsing and re-serializing every existing row
+            needs_newline = False
+            if csv_path.stat().st_size > 0:
+                with open(csv_path, 'rb') as f:
+                    f.seek(-1, os.SEEK_END)
+                    needs_newline = f.read(1) not in (b'\n', b'\r')
+            with open(csv_path, 'a', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+                if f.tell() == 0:
+                    writer.writeheader()
+                elif needs_newline:
+                    f.write('\r\n')
+                writer.writerow(row)
+
+            if keys is not None:
+                keys.extend(_key_column([row]))
+                await run_in_threadpool(_refresh_index, csv_path, keys)
+
+            return version
+        finally:
+            csv_lock.release()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error writing to CSV: {str(e)}")
+
+async def find_csv_row(csv_path: Path, api_key: str) -> Optional[int]:
+    """Return the index of the row with ``api_key`` without materializing rows."""
+    ensure_data_dir()
+    try:
+        async with csv_lock._lock:
+            if not csv_path.exists():
+                return None
+
+            index = load_index(csv_path) if INDEX_ENABLED else None
+            if index is not None:
+                return index.find(KEY_FIELD, api_key)
+
+            return await run_in_threadpool(_scan_for_key, csv_path, api_key)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error reading CSV: {str(e)}")
+
 async def update_csv_row(csv_path: Path, api_key: str, updates: Dict) -> Optional[Dict]:
     """Update a specific row in the CSV file."""
     ensure_data_dir()
+    # Only load every row once we know there is something to change
+    if await find_csv_row(csv_path, api_key) is None:
+        return None
     data = await read_csv(csv_path)
     
     for row in data:
@@ -98,6 +213,8 @@ async def update_csv_row(csv_path: Path, api_key: str, updates: Dict) -> Optiona
 async def delete_csv_row(csv_path: Path, api_key: str) -> bool:
     """Delete a specific row from the CSV file."""
     ensure_data_dir()
+    if await find_csv_row(csv_path, api_key) is None:
+        return False
     data = await read_csv(csv_path)
     original_length = len(data)
     
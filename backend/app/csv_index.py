@@ -0,0 +1,177 @@
+"""Memory-mapped lookup index over columns of the broker CSV table.
+
+The CSV file stays the source of truth for reads, import and export; the
+index is a derived file written next to it (``backend_table.idx``) so key
+lookups can search the mapped bytes instead of parsing the whole CSV.
+
+Layout (native byte order, recorded in the header)::
+
+    header      magic, format version, byte order, ncols, nrows,
+                size and mtime_ns of the CSV it was built from
+    directory   per column: name, data offset
+    data        per column: (nrows + 1) uint64 offsets, then a UTF-8 blob
+
+Every offsets table starts on an 8-byte boundary so it can be cast in place.
+An index whose recorded size/mtime no longer match the CSV is ignored.
+"""
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_right
+from itertools import accumulate
+from pathlib import Path
+from typing import Dict, List, Optional
+
+MAGIC = b"BRIDX\x00\x00\x00"
+FORMAT_VERSION = 1
+BYTE_ORDER = 1 if sys.byteorder == "little" else 2
+
+_HEADER = struct.Struct("=8sIBxxxIQQq")
+_COLUMN = struct.Struct("=H6xQ")
+
+def index_path(csv_path: Path) -> Path:
+    """Return the index path that belongs to a CSV file."""
+    return csv_path.with_suffix(".idx")
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+class CSVIndex:
+    """Read-only view over a memory-mapped index file."""
+
+    def __init__(self, path: Path):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mm)
+        size = len(self._mm)
+
+        magic, version, byte_order, ncols, nrows, src_size, src_mtime_ns = _HEADER.unpack_from(view, 0)
+        if magic != MAGIC or version != FORMAT_VERSION or byte_order != BYTE_ORDER:
+            raise ValueError(f"Unsupported index file: {path}")
+
+        self.nrows = nrows
+        self.source_size = src_size
+        self.source_mtime_ns = src_mtime_ns
+        self._columns: Dict[str, tuple] = {}
+
+        pos = _HEADER.size
+        for _ in range(ncols):
+            name_len, data_offset = _COLUMN.unpack_from(view, pos)
+            pos += _COLUMN.size
+            name = bytes(view[pos:pos + name_len]).decode("utf-8")
+            pos += name_len
+
+            # A truncated file can still carry a header that matches the CSV
+            blob_start = data_offset + (nrows + 1) * 8
+            if blob_start > size:
+                raise ValueError(f"Truncated index file: {path}")
+            offsets = view[data_offset:blob_start].cast("Q")
+            if blob_start + offsets[nrows] > size:
+                raise ValueError(f"Truncated index file: {path}")
+            self._columns[name] = (offsets, blob_start)
+
+    def matches(self, csv_path: Path) -> bool:
+        """Whether this index was built from the CSV as it is on disk now."""
+        try:
+            st = csv_path.stat()
+        except FileNotFoundError:
+            return False
+        return st.st_size == self.source_size and st.st_mtime_ns == self.source_mtime_ns
+
+    def column(self, name: str) -> List[str]:
+        """Decode a whole column at once."""
+        offsets, blob_start = self._columns[name]
+        offsets = offsets.tolist()
+        raw = self._mm[blob_start:blob_start + offsets[-1]]
+        # ASCII byte offsets are also character offsets, so decode once and slice
+        if raw.isascii():
+            text = raw.decode("ascii")
+            return [text[a:b] for a, b in zip(offsets, offsets[1:])]
+        return [raw[a:b].decode("utf-8") for a, b in zip(offsets, offsets[1:])]
+
+    def find(self, name: str, value: str) -> Optional[int]:
+        """Return the first row index whose ``name`` cell equals ``value``."""
+        offsets, blob_start = self._columns[name]
+        needle = value.encode("utf-8")
+        if not needle:
+            for index in range(self.nrows):
+                if offsets[index] == offsets[index + 1]:
+                    return index
+            return None
+
+        # Search the mapping in place, then confirm the hit is a whole cell
+        blob_end = blob_start + offsets[self.nrows]
+        pos = self._mm.find(needle, blob_start, blob_end)
+        while pos != -1:
+            rel = pos - blob_start
+            index = bisect_right(offsets, rel) - 1
+            if offsets[index] == rel and offsets[index + 1] - rel == len(needle):
+                return index
+            pos = self._mm.find(needle, pos + 1, blob_end)
+        return None
+
+    def __len__(self) -> int:
+        return self.nrows
+
+def write_index(csv_path: Path, columns: Dict[str, List[str]]) -> Path:
+    """Write the index for ``csv_path`` from columns of its current rows."""
+    names = [name.encode("utf-8") for name in columns]
+    nrows = len(next(iter(columns.values()), []))
+
+    # Lay out the directory first so data offsets are known up front
+    pos = _HEADER.size + sum(_COLUMN.size + len(name) for name in names)
+    sections = []
+    for column in columns.values():
+        pos = _align(pos)
+        text = "".join(column)
+        if text.isascii():
+            blob = text.encode("ascii")
+            lengths = map(len, column)
+        else:
+            encoded = [v.encode("utf-8") for v in column]
+            blob = b"".join(encoded)
+            lengths = map(len, encoded)
+        data = array("Q", accumulate(lengths, initial=0)).tobytes() + blob
+        sections.append((pos, data))
+        pos += len(data)
+
+    st = csv_path.stat()
+    path = index_path(csv_path)
+    tmp_path = path.with_suffix(".idx.tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, BYTE_ORDER, len(names), nrows,
+                             st.st_size, st.st_mtime_ns))
+        for name, (offset, _) in zip(names, sections):
+            f.write(_COLUMN.pack(len(name), offset))
+            f.write(name)
+        for offset, data in sections:
+            f.write(b"\x00" * (offset - f.tell()))
+            f.write(data)
+
+    # Readers holding the old mapping keep their inode; new readers see the new file
+    os.replace(tmp_path, path)
+    return path
+
+_open_indexes: Dict[Path, CSVIndex] = {}
+
+def load_index(csv_path: Path) -> Optional[CSVIndex]:
+    """Return the mapped index for ``csv_path`` if present and up to date."""
+    index = _open_indexes.get(csv_path)
+    if index is not None and index.matches(csv_path):
+        return index
+
+    _open_indexes.pop(csv_path, None)
+    path = index_path(csv_path)
+    if not path.exists():
+        return None
+    try:
+        index = CSVIndex(path)
+    except (OSError, ValueError, TypeError, struct.error):
+        return None
+    if not index.matches(csv_path):
+        return None
+
+    _open_indexes[csv_path] = index
+    return index
@@ -1,8 +1,21 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Dict
+from fastapi import HTTPException, status
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 SQLALCHEMY_DATABASE_URL = "sqlite+aiosqlite:///./blackrose.db"
 
+# Maximum concurrent sessions per subsystem, so streaming sockets and
+# background jobs can never starve request handlers of connections
+CONNECTION_BUDGETS = {
+    "http": 10,
+    "websocket": 4,
+    "background": 3,
+}
+
 engine = create_async_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
 )
@@ -13,9 +26,89 @@ AsyncSessionLocal = sessionmaker(
 
 Base = declarative_base()
 
-async def get_db():
-    async with AsyncSessionLocal() as session:
-        try:
+class PoolMetrics:
+    def __init__(self):
+        self.checked_out = 0
+        self.peak_checked_out = 0
+        self.checkouts = 0
+
+    def on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        self.checked_out += 1
+        self.checkouts += 1
+        self.peak_checked_out = max(self.peak_checked_out, self.checked_out)
+
+    def on_checkin(self, dbapi_connection, connection_record):
+        self.checked_out -= 1
+
+pool_metrics = PoolMetrics()
+event.listen(engine.sync_engine, "checkout", pool_metrics.on_checkout)
+event.listen(engine.sync_engine, "checkin", pool_metrics.on_checkin)
+
+class ConnectionBudget:
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._semaphore = asyncio.Semaphore(limit)
+        self.in_use = 0
+        self.peak = 0
+        self.waits = 0
+        self.rejected = 0
+
+    async def acquire(self, wait: bool = True) -> bool:
+        if self._semaphore.locked():
+            if not wait:
+                self.rejected += 1
+                return False
+            self.waits += 1
+        await self._semaphore.acquire()
+        self.in_use += 1
+        self.peak = max(self.peak, self.in_use)
+        return True
+
+    def release(self):
+        self.in_use -= 1
+        self._semaphore.release()
+
+budgets = {name: ConnectionBudget(limit) for name, limit in CONNECTION_BUDGETS.items()}
+
+@asynccontextmanager
+async def session_scope(subsystem: str, wait: bool = True):
+    """Open a short-lived session charged against a subsystem's budget.
+
+    With ``wait=False`` an exhausted budget answers 503 immediately instead
+    of queueing the caller.
+    """
+    budget = budgets[subsystem]
+    if not await budget.acquire(wait):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server busy, try again shortly",
+            headers={"Retry-After": "1"},
+        )
+    try:
+        async with AsyncSessionLocal() as session:
             yield session
-        finally:
-            await session.close()
+    finally:
+        budget.release()
+
+async def get_db():
+    # Request handlers never queue on the budget; they shed with 503
+    async with session_scope("http", wait=False) as session:
+        yield session
+
+def pool_stats() -> Dict:
+    return {
+        "pool": engine.pool.status(),
+        "checked_out": pool_metrics.checked_out,
+        "peak_checked_out": pool_metrics.peak_checked_out,
+        "checkouts": pool_metrics.checkouts,
+        "subsystems": {
+            name: {
+                "budget": budget.limit,
+                "in_use": budget.in_use,
+                "peak": budget.peak,
+                "waits": budget.waits,
+                "rejected": budget.rejected,
+            }
+            for name, budget in budgets.items()
+        },
+    }
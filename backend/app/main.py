@@ -1,7 +1,6 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Depends, HTTPException, status, BackgroundTasks
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Depends, HTTPException, status, BackgroundTasks, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional
@@ -10,12 +9,16 @@ from pydantic import BaseModel
 import json
 import asyncio
 import random
-from .database import get_db, engine
+from .database import engine, session_scope, pool_stats
 from .auth import authenticate_user, create_access_token, get_current_user, get_password_hash, get_user
 from .models import Base, User, Session, RandomNumber, BackendTableEntry, PerformanceData
-from .background_tasks import generate_random_numbers
-from .csv_handler import read_csv, write_csv, update_csv_row, delete_csv_row, csv_lock, backup_csv, ensure_data_dir
+from .background_tasks import sample_random_number, sweep_expired_sessions
+from .csv_handler import read_csv, write_csv, find_csv_row, append_csv_row, update_csv_row, delete_csv_row, csv_lock, backup_csv, ensure_data_dir, restore_csv
 from .services import PerformanceService
+from .scheduler import scheduler
+from .response_cache import response_cache, build_response
+from .admission import admission_controller, user_admission, login_admission, client_address
+from starlette.concurrency import run_in_threadpool
 import shutil
 from fastapi.responses import FileResponse
 
@@ -42,35 +45,42 @@ class UserCreate(BaseModel):
     username: str
     password: str
 
+async def register_admission(user_data: UserCreate, request: Request):
+    """Admit a registration per requested username and client address."""
+    async with admission_controller.admit("auth", user_data.username, expensive=True,
+                                          client=client_address(request)):
+        yield user_data.username
+
 # Initialize performance service
 performance_service = PerformanceService()
 
+# Periodic work, all run by the supervised fixed-rate scheduler
+scheduler.add_job("random_number_sample", sample_random_number, interval=1)
+scheduler.add_job("performance_sample", performance_service.sample, interval=1)
+scheduler.add_job("performance_retention", performance_service.apply_retention, interval=10)
+scheduler.add_job("session_sweep", sweep_expired_sessions, interval=300)
+scheduler.add_job("admission_sweep", admission_controller.sweep, interval=60)
+
 @app.on_event("startup")
 async def startup_event():
     # Create database tables
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
-    
-    # Start random number generator
-    async for db in get_db():
-        asyncio.create_task(generate_random_numbers(db))
-        break
-    
-    # Start performance service with a new database session
-    async for db in get_db():
-        await performance_service.start(db)
-        break
+
+    # Start sampling, retention and sweeping jobs
+    await scheduler.start()
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    await scheduler.stop()
     await performance_service.stop()
 
 @app.post("/token")
 async def login(
-    form_data: OAuth2PasswordRequestForm = Depends(),
-    db: AsyncSession = Depends(get_db)
+    username: str = Depends(login_admission()),
+    form_data: OAuth2PasswordRequestForm = Depends()
 ):
-    user = await authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user(form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -89,26 +99,25 @@ async def login(
         token=access_token,
         expires_at=datetime.utcnow() + access_token_expires
     )
-    db.add(session)
-    await db.commit()
+    async with session_scope("http", wait=False) as db:
+        db.add(session)
+        await db.commit()
     
     return {"access_token": access_token, "token_type": "bearer"}
 
 @app.websocket("/ws/random-numbers")
-async def websocket_random_numbers(
-    websocket: WebSocket,
-    db: AsyncSession = Depends(get_db)
-):
+async def websocket_random_numbers(websocket: WebSocket):
     await websocket.accept()
     try:
         while True:
-            # Get latest random number
-            result = await db.execute(
-                select(RandomNumber)
-                .order_by(RandomNumber.timestamp.desc())
-                .limit(1)
-            )
-            number = result.scalar_one_or_none()
+            # Get latest random number, holding a session only for the query
+            async with session_scope("websocket") as db:
+                result = await db.execute(
+                    select(RandomNumber)
+                    .order_by(RandomNumber.timestamp.desc())
+                    .limit(1)
+                )
+                number = result.scalar_one_or_none()
             
             if number:
                 await websocket.send_json({
@@ -123,31 +132,34 @@ async def websocket_random_numbers(
         await websocket.close()
 
 @app.get("/api/csv")
-async def get_csv_data(current_user: str = Depends(get_current_user)):
+async def get_csv_data(request: Request, current_user: str = Depends(user_admission("csv_read"))):
     """Fetch the CSV file data."""
-    return await read_csv(CSV_PATH)
+    # Capture the version before reading so a concurrent write can only make
+    # the entry stale, never mislabel newer data as current
+    version = csv_lock.version
+    entry = response_cache.get("csv", version)
+    if entry is None:
+        entry = response_cache.put("csv", version, await read_csv(CSV_PATH))
+    return build_response(request, entry)
 
 @app.post("/api/csv")
 async def create_csv_entry(
     entry: Dict,
-    current_user: str = Depends(get_current_user)
+    current_user: str = Depends(user_admission("csv_write", expensive=True))
 ):
     """Create a new entry in the CSV file."""
-    data = await read_csv(CSV_PATH)
-    
     # Check for duplicate API key
-    if any(row['API key'] == entry['API key'] for row in data):
+    if await find_csv_row(CSV_PATH, entry['API key']) is not None:
         raise HTTPException(status_code=400, detail="API key already exists")
     
-    data.append(entry)
-    version = await write_csv(CSV_PATH, data)
+    version = await append_csv_row(CSV_PATH, entry)
     return {"message": "Entry created", "version": version}
 
 @app.put("/api/csv/{api_key}")
 async def update_csv_entry(
     api_key: str,
     updates: Dict,
-    current_user: str = Depends(get_current_user)
+    current_user: str = Depends(user_admission("csv_write", expensive=True))
 ):
     """Update an entry in the CSV file."""
     updated_row = await update_csv_row(CSV_PATH, api_key, updates)
@@ -158,7 +170,7 @@ async def update_csv_entry(
 @app.delete("/api/csv/{api_key}")
 async def delete_csv_entry(
     api_key: str,
-    current_user: str = Depends(get_current_user)
+    current_user: str = Depends(user_admission("csv_write", expensive=True))
 ):
     """Delete an entry from the CSV file."""
     success = await delete_csv_row(CSV_PATH, api_key)
@@ -182,18 +194,32 @@ async def websocket_endpoint(websocket: WebSocket):
     finally:
         await websocket.close()
 
+@app.get("/api/metrics")
+async def get_metrics(current_user: str = Depends(get_current_user)):
+    """Expose internal counters for admission control and caching."""
+    return {
+        "admission": admission_controller.stats(),
+        "response_cache": response_cache.stats(),
+        "database": pool_stats(),
+        "scheduler": scheduler.stats(),
+    }
+
 @app.get("/users/me")
 async def read_users_me(current_user: str = Depends(get_current_user)):
     return {"username": current_user}
 
 @app.post("/register", response_model=dict)
-async def register(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
+async def register(
+    user_data: UserCreate,
+    username: str = Depends(register_admission)
+):
     """Register a new user."""
     try:
         # Check if username already exists
-        query = select(User).where(User.username == user_data.username)
-        result = await db.execute(query)
-        existing_user = result.scalar_one_or_none()
+        async with session_scope("http", wait=False) as db:
+            query = select(User).where(User.username == user_data.username)
+            result = await db.execute(query)
+            existing_user = result.scalar_one_or_none()
         
         if existing_user:
             raise HTTPException(
@@ -202,14 +228,15 @@ async def register(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
             )
         
         # Create new user
-        hashed_password = get_password_hash(user_data.password)
+        hashed_password = await run_in_threadpool(get_password_hash, user_data.password)
         new_user = User(
             username=user_data.username,
             hashed_password=hashed_password
         )
-        db.add(new_user)
-        await db.commit()
-        await db.refresh(new_user)
+        async with session_scope("http", wait=False) as db:
+            db.add(new_user)
+            await db.commit()
+            await db.refresh(new_user)
         
         # Create access token
         access_token = create_access_token(
@@ -221,8 +248,9 @@ async def register(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
             "token_type": "bearer"
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
-        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e)
@@ -247,12 +275,13 @@ async def get_dummy_credentials():
     }
 
 @app.websocket("/ws/performance")
-async def websocket_performance(websocket: WebSocket, db: AsyncSession = Depends(get_db)):
+async def websocket_performance(websocket: WebSocket):
     await websocket.accept()
     
     try:
         # Send initial dataset (last 50 points)
-        historical_data = await performance_service.get_recent_data(db)
+        async with session_scope("websocket") as db:
+            historical_data = await performance_service.get_recent_data(db)
         initial_data = [
             {
                 "timestamp": data.timestamp.isoformat(),
@@ -279,14 +308,18 @@ async def websocket_performance(websocket: WebSocket, db: AsyncSession = Depends
 
 # Backup management endpoints
 @app.get("/api/backups", response_model=List[str])
-async def list_backups(current_user: str = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+async def list_backups(request: Request, current_user: str = Depends(user_admission("csv_read"))):
     """List all available CSV backups."""
     try:
-        data_dir = ensure_data_dir()
-        csv_path = data_dir / "backend_table.csv"
-        backup_pattern = f"{csv_path.stem}_backup_*{csv_path.suffix}"
-        backups = sorted(csv_path.parent.glob(backup_pattern), reverse=True)
-        return [backup.name for backup in backups]
+        version = csv_lock.version
+        entry = response_cache.get("backups", version)
+        if entry is None:
+            data_dir = ensure_data_dir()
+            csv_path = data_dir / "backend_table.csv"
+            backup_pattern = f"{csv_path.stem}_backup_*{csv_path.suffix}"
+            backups = sorted(csv_path.parent.glob(backup_pattern), reverse=True)
+            entry = response_cache.put("backups", version, [backup.name for backup in backups])
+        return build_response(request, entry)
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -296,8 +329,7 @@ async def list_backups(current_user: str = Depends(get_current_user), db: AsyncS
 @app.post("/api/backups/{backup_name}/restore")
 async def restore_backup(
     backup_name: str,
-    current_user: str = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    current_user: str = Depends(user_admission("csv_write", expensive=True))
 ):
     """Restore from a specific backup."""
     try:
@@ -311,8 +343,9 @@ async def restore_backup(
         # Create a backup of current state before restore
         version = await csv_lock.acquire()
         try:
-            current_backup = backup_csv(csv_path)
-            shutil.copy2(backup_path, csv_path)
+            # File copies run off the event loop; the lock still serializes writers
+            current_backup = await run_in_threadpool(backup_csv, csv_path)
+            await run_in_threadpool(restore_csv, backup_path, csv_path)
             return {
                 "message": "Backup restored successfully",
                 "current_backup": current_backup.name,
@@ -336,8 +369,7 @@ async def restore_backup(
 @app.get("/api/backups/{backup_name}/download")
 async def download_backup(
     backup_name: str,
-    current_user: str = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    current_user: str = Depends(user_admission("csv_read"))
 ):
     """Download a specific backup."""
     try:
@@ -0,0 +1,118 @@
+import gzip
+import json
+import uuid
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+from fastapi import Request
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+# Payloads smaller than this are not worth compressing
+GZIP_MIN_SIZE = 1024
+GZIP_LEVEL = 6
+
+# Versions restart at 1 with the process, so tag ETags with a per-process epoch
+_EPOCH = uuid.uuid4().hex[:8]
+
+def dumps(payload: Any) -> bytes:
+    """Encode payload as JSON bytes, preferring orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+@dataclass(frozen=True)
+class CachedResponse:
+    version: int
+    body: bytes
+    gzip_body: Optional[bytes] = None
+
+    @property
+    def etag(self) -> str:
+        return f'W/"{_EPOCH}-{self.version}"'
+
+class ResponseCache:
+    """Holds pre-serialized JSON responses keyed by name and store version.
+
+    An entry is only valid for the version it was built at; any write that
+    goes through ``CSVLock.acquire`` bumps the version and implicitly
+    invalidates every entry.
+    """
+
+    def __init__(self, compress: bool = True):
+        self._entries: Dict[str, CachedResponse] = {}
+        self.compress = compress
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, version: int) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is None or entry.version != version:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def put(self, key: str, version: int, payload: Any) -> CachedResponse:
+        body = dumps(payload)
+        gzip_body = None
+        if self.compress and len(body) >= GZIP_MIN_SIZE:
+            gzip_body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+        entry = CachedResponse(version=version, body=body, gzip_body=gzip_body)
+
+        # Never let a slow reader overwrite a newer entry with stale data
+        current = self._entries.get(key)
+        if current is None or current.version <= version:
+            self._entries[key] = entry
+        return entry
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """Whether an Accept-Encoding header allows gzip, honouring q-values.
+
+    An explicit ``gzip`` entry wins over ``*``; ``q=0`` means refused.
+    """
+    wildcard = None
+    for item in accept_encoding.split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        if coding not in ("gzip", "x-gzip", "*"):
+            continue
+
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+
+        if coding == "*":
+            wildcard = q > 0
+        else:
+            return q > 0
+    return bool(wildcard)
+
+def build_response(request: Request, entry: CachedResponse) -> Response:
+    """Send cached bytes directly, honouring If-None-Match and Accept-Encoding."""
+    headers = {"ETag": entry.etag, "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+
+    if request.headers.get("if-none-match") == entry.etag:
+        return Response(status_code=304, headers=headers)
+
+    if entry.gzip_body is not None and accepts_gzip(request.headers.get("accept-encoding", "")):
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=entry.gzip_body, media_type="application/json", headers=headers)
+
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+response_cache = ResponseCache()
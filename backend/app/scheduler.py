@@ -0,0 +1,139 @@
+import asyncio
+import inspect
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Union
+
+# Restart backoff after a failing run: doubles per consecutive failure
+RESTART_BACKOFF_BASE = 1.0
+RESTART_BACKOFF_MAX = 60.0
+
+# How long shutdown waits for in-flight runs before cancelling them
+DRAIN_TIMEOUT = 5.0
+
+JobFunc = Callable[[], Union[None, Awaitable[None]]]
+
+class Job:
+    def __init__(self, name: str, func: JobFunc, interval: float):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.runs = 0
+        self.failures = 0
+        self.overruns = 0
+        self.skipped_ticks = 0
+        self.last_run_time = 0.0
+        self.max_run_time = 0.0
+        self.total_run_time = 0.0
+        self.consecutive_failures = 0
+
+    def stats(self) -> Dict:
+        return {
+            "interval": self.interval,
+            "runs": self.runs,
+            "failures": self.failures,
+            "overruns": self.overruns,
+            "skipped_ticks": self.skipped_ticks,
+            "last_run_time": self.last_run_time,
+            "max_run_time": self.max_run_time,
+            "avg_run_time": self.total_run_time / self.runs if self.runs else 0.0,
+        }
+
+class Scheduler:
+    """Runs fixed-rate jobs under supervision and drains them on shutdown.
+
+    Each job is scheduled on a fixed grid (start + n * interval), so the time
+    spent inside a run never pushes later ticks back. A run that overshoots
+    one or more ticks is counted as an overrun and the missed ticks are
+    skipped rather than replayed back to back.
+    """
+
+    def __init__(self):
+        self._jobs: List[Job] = []
+        self._tasks: List[asyncio.Task] = []
+        self._stopping: Optional[asyncio.Event] = None
+
+    def add_job(self, name: str, func: JobFunc, interval: float) -> Job:
+        if self._tasks:
+            raise RuntimeError("Cannot add jobs to a running scheduler")
+        job = Job(name, func, interval)
+        self._jobs.append(job)
+        return job
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._stopping = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._supervise(job)) for job in self._jobs]
+
+    async def stop(self, timeout: float = DRAIN_TIMEOUT):
+        if not self._tasks:
+            return
+        self._stopping.set()
+        _, pending = await asyncio.wait(self._tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        self._tasks = []
+
+    async def _sleep_until(self, deadline: float) -> bool:
+        """Sleep until ``deadline`` on the loop clock; False if stopping."""
+        delay = deadline - asyncio.get_running_loop().time()
+        if delay > 0:
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+        return not self._stopping.is_set()
+
+    async def _run_once(self, job: Job):
+        started = time.perf_counter()
+        try:
+            result = job.func()
+            if inspect.isawaitable(result):
+                await result
+        finally:
+            elapsed = time.perf_counter() - started
+            job.runs += 1
+            job.last_run_time = elapsed
+            job.total_run_time += elapsed
+            job.max_run_time = max(job.max_run_time, elapsed)
+
+    async def _supervise(self, job: Job):
+        loop = asyncio.get_running_loop()
+        next_run = loop.time()
+
+        while not self._stopping.is_set():
+            failed = False
+            try:
+                await self._run_once(job)
+                job.consecutive_failures = 0
+            except Exception as e:
+                failed = True
+                job.failures += 1
+                job.consecutive_failures += 1
+                backoff = min(
+                    RESTART_BACKOFF_BASE * 2 ** (job.consecutive_failures - 1),
+                    RESTART_BACKOFF_MAX,
+                )
+                print(f"Error in scheduled job {job.name}: {e}; restarting in {backoff:.1f}s")
+                if not await self._sleep_until(loop.time() + backoff):
+                    break
+
+            # Advance on the fixed grid; skip ticks that are already in the past
+            next_run += job.interval
+            now = loop.time()
+            if now > next_run:
+                missed = int((now - next_run) // job.interval) + 1
+                next_run += missed * job.interval
+                # Ticks lost to restart backoff are not the job's overrun
+                if not failed:
+                    job.overruns += 1
+                    job.skipped_ticks += missed
+
+            if not await self._sleep_until(next_run):
+                break
+
+    def stats(self) -> Dict:
+        return {job.name: job.stats() for job in self._jobs}
+
+scheduler = Scheduler()
@@ -4,93 +4,96 @@ from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, delete
 from .models import PerformanceData
-from .database import get_db
+from .database import session_scope
+
+# Number of performance points kept in the database
+RETAINED_POINTS = 50
+
+# A subscriber that cannot take a message within this long is dropped
+SEND_TIMEOUT = 1.0
+
+# Close code sent to a dropped subscriber ("try again later")
+SLOW_CONSUMER_CLOSE_CODE = 1013
 
 class PerformanceService:
-    def __init__(self):
-        self.subscribers = set()
-        self._running = False
-        self._task = None
+    """Samples performance data and broadcasts it to WebSocket subscribers.
 
-    async def start(self, db: AsyncSession):
-        if self._running:
-            return
-        
-        self._running = True
-        self._task = asyncio.create_task(self._generate_performance_data())
+    ``sample`` and ``apply_retention`` are run by the scheduler.
+    """
+
+    def __init__(self):
+        # Each subscriber has its own lock so overlapping broadcasts deliver
+        # messages to it one at a time and in order
+        self.subscribers = {}
+        self._broadcasts = set()
 
     async def stop(self):
-        if not self._running:
-            return
-        
-        self._running = False
-        if self._task:
-            self._task.cancel()
-            try:
-                await self._task
-            except asyncio.CancelledError:
-                pass
-            self._task = None
+        for task in list(self._broadcasts):
+            task.cancel()
+        await asyncio.gather(*self._broadcasts, return_exceptions=True)
 
     def subscribe(self, websocket):
-        self.subscribers.add(websocket)
+        self.subscribers.setdefault(websocket, asyncio.Lock())
 
     def unsubscribe(self, websocket):
-        self.subscribers.discard(websocket)
+        self.subscribers.pop(websocket, None)
 
-    async def _generate_performance_data(self):
-        while self._running:
+    async def sample(self):
+        # Generate new performance data
+        value = random.uniform(0, 100)
+        timestamp = datetime.utcnow()
+
+        # Store in database, holding a session only for the write
+        async with session_scope("background") as db:
+            new_data = PerformanceData(timestamp=timestamp, value=value)
+            db.add(new_data)
+            await db.commit()
+
+        # Broadcast outside the scheduled run so a slow client never shows
+        # up as a sampling overrun
+        message = {
+            "timestamp": timestamp.isoformat(),
+            "value": value
+        }
+        task = asyncio.create_task(self._broadcast(message))
+        self._broadcasts.add(task)
+        task.add_done_callback(self._broadcasts.discard)
+
+    async def _send(self, websocket, lock, message):
+        async with lock:
+            # Dropped while this message was queued behind an earlier one
+            if self.subscribers.get(websocket) is not lock:
+                return
             try:
-                # Create a new database session for each iteration
-                async for db in get_db():
-                    try:
-                        # Generate new performance data
-                        value = random.uniform(0, 100)
-                        timestamp = datetime.utcnow()
-
-                        # Store in database
-                        new_data = PerformanceData(timestamp=timestamp, value=value)
-                        db.add(new_data)
-                        await db.commit()
-
-                        # Clean up old data (keep last 50 points)
-                        stmt = select(PerformanceData).order_by(PerformanceData.timestamp.desc()).offset(50)
-                        result = await db.execute(stmt)
-                        old_records = result.scalars().all()
-                        if old_records:
-                            stmt = delete(PerformanceData).where(PerformanceData.id.in_([r.id for r in old_records]))
-                            await db.execute(stmt)
-                            await db.commit()
-
-                        # Broadcast to all subscribers
-                        message = {
-                            "timestamp": timestamp.isoformat(),
-                            "value": value
-                        }
-                        dead_connections = set()
-                        for websocket in self.subscribers:
-                            try:
-                                await websocket.send_json(message)
-                            except:
-                                dead_connections.add(websocket)
-
-                        # Remove dead connections
-                        for websocket in dead_connections:
-                            self.unsubscribe(websocket)
-
-                        break  # Exit the database session loop
-                    except Exception as e:
-                        print(f"Error in database operation: {e}")
-                        await db.rollback()
-                        break
-
-                await asyncio.sleep(1)  # Generate data every second
-
-            except Exception as e:
-                print(f"Error in performance data generation: {e}")
-                await asyncio.sleep(1)  # Wait before retrying
-
-    async def get_recent_data(self, db: AsyncSession, limit: int = 50):
+                await asyncio.wait_for(websocket.send_json(message), SEND_TIMEOUT)
+            except Exception:
+                await self._drop(websocket)
+
+    async def _drop(self, websocket):
+        # Unsubscribe first so no further broadcast queues up for it, then
+        # close the socket so the client and its handler see the drop too
+        self.unsubscribe(websocket)
+        try:
+            await asyncio.wait_for(websocket.close(code=SLOW_CONSUMER_CLOSE_CODE), SEND_TIMEOUT)
+        except Exception:
+            pass
+
+    async def _broadcast(self, message):
+        # Snapshot the subscribers; sockets unsubscribe themselves while we await sends
+        subscribers = list(self.subscribers.items())
+        await asyncio.gather(*(self._send(websocket, lock, message) for websocket, lock in subscribers))
+
+    async def apply_retention(self):
+        # Clean up old data (keep last RETAINED_POINTS points)
+        async with session_scope("background") as db:
+            stmt = select(PerformanceData.id).order_by(PerformanceData.timestamp.desc()).offset(RETAINED_POINTS)
+            result = await db.execute(stmt)
+            old_ids = result.scalars().all()
+            if old_ids:
+                await db.execute(delete(PerformanceData).where(PerformanceData.id.in_(old_ids)))
+                await db.commit()
+
+    async def get_recent_data(self, db: AsyncSession, limit: int = RETAINED_POINTS):
         stmt = select(PerformanceData).order_by(PerformanceData.timestamp.desc()).limit(limit)
         result = await db.execute(stmt)
         data = result.scalars().all()